@@ -1,14 +1,38 @@
 import asyncio
 import logging
+import time
 
 from src.refiller_client import RefillerClient
 from src.config import Config
 
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+class CachedTimeFormatter(logging.Formatter):
+    """Formatter rendering asctime once per second instead of per record"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cached_second = None
+        self._cached_time = ""
+
+    def formatTime(self, record, datefmt=None):
+        if datefmt:
+            return super().formatTime(record, datefmt)
+        second = int(record.created)
+        if second != self._cached_second:
+            self._cached_time = time.strftime(
+                self.default_time_format, self.converter(second)
+            )
+            self._cached_second = second
+        if self.default_msec_format:
+            return self.default_msec_format % (self._cached_time, record.msecs)
+        return self._cached_time
+
+
+handler = logging.StreamHandler()
+handler.setFormatter(
+    CachedTimeFormatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 )
+logging.basicConfig(level=logging.INFO, handlers=[handler])
 logger = logging.getLogger(__name__)
 
 
@@ -16,22 +40,25 @@ async def main():
     logger.info("💊 Starting refiller service...")
 
     config = Config.from_toml()
-    client = RefillerClient(config.base_url)
 
-    try:
-        logger.info("🔐 Logging in to retrieve session cookie...")
-        cookie = await client.login(config.username, config.password, config.office)
-        logger.info("🍪 Login successful, requesting medication refill...")
-        success = await client.request_refill(cookie, config.med_id)
-        if success:
-            logger.info("✅ Medication refill request successful!")
-        else:
-            logger.error("❌ Medication refill request failed...")
-    except Exception as e:
-        logger.error(f"Login failed: {e}")
-        return
-    finally:
-        await client.close()
+    async with RefillerClient(config.base_url) as client:
+        try:
+            logger.info("🔐 Logging in to retrieve session cookie...")
+            await client.login(config.username, config.password, config.office)
+            logger.info("🍪 Login successful, requesting medication refill...")
+            success = await client.request_refill(config.med_id)
+            if success:
+                logger.info("✅ Medication refill request successful!")
+            else:
+                logger.error("❌ Medication refill request failed...")
+        except Exception as e:
+            logger.error("Login failed: %s", e)
+            return
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        asyncio.run(main(), loop_factory=uvloop.new_event_loop)
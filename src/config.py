@@ -1,12 +1,33 @@
 from dataclasses import dataclass
+from functools import lru_cache
+from operator import itemgetter
 import os
 from pathlib import Path
 import tomllib
+from types import MappingProxyType
+from typing import Any
 
 
-CONFIG_PATH = os.environ["CONFIG_PATH"]
+REQUIRED_FIELDS = (
+    "username",
+    "password",
+    "base_url",
+    "med_id",
+    "office",
+)
+_REQUIRED_FIELD_SET = frozenset(REQUIRED_FIELDS)
+# Fetches every required value in one call, in Config field order
+_get_required_values = itemgetter(*REQUIRED_FIELDS)
 
-@dataclass
+
+@lru_cache(maxsize=32)
+def _load_toml(path: str, mtime_ns: int, size: int) -> MappingProxyType[str, Any]:
+    # mtime_ns and size are part of the cache key so an edited file is
+    # parsed again. The parse is shared by every caller, so it is read-only.
+    return MappingProxyType(tomllib.loads(Path(path).read_bytes().decode()))
+
+
+@dataclass(frozen=True, slots=True)
 class Config:
     username: str
     password: str
@@ -15,42 +36,43 @@ class Config:
     office: str
 
     @classmethod
-    def from_toml(cls, path: str = CONFIG_PATH) -> "Config":
-
-        config_file = Path(path)
-        required_fields = [
-            "username",
-            "password",
-            "base_url",
-            "med_id",
-            "office",
-        ]
-
-        if not config_file.exists():
-            raise FileNotFoundError(f"Config file not found at {path}")
-
-        with open(config_file, "rb") as file:
-            config = tomllib.load(file)
-
-        missing_or_empty_fields = [
-            field
-            for field in required_fields
-            if field not in config or not config[field]
-        ]
-
-        if missing_or_empty_fields:
-            raise ValueError(
-                "Missing or empty required fields in config file: "
-                f"{', '.join(missing_or_empty_fields)}"
-            )
+    def from_toml(cls, source: str | Path | bytes | None = None) -> "Config":
+        if source is None:
+            source = os.environ.get("CONFIG_PATH")
+            if source is None:
+                raise RuntimeError("CONFIG_PATH not set")
+
+        if isinstance(source, bytes):
+            config = tomllib.loads(source.decode())
+        else:
+            config_file = Path(source)
+            try:
+                stat = config_file.stat()
+                config = _load_toml(str(config_file), stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                raise FileNotFoundError(
+                    f"Config file not found at {source}"
+                ) from None
 
         try:
-            return cls(
-                username=config["username"],
-                password=config["password"],
-                base_url=config["base_url"],
-                med_id=config["med_id"],
-                office=config["office"],
+            values = _get_required_values(config)
+        except KeyError:
+            pass
+        else:
+            if all(values):
+                return cls(*values)
+
+        # Only reached for an invalid config, so the detailed scan is fine
+        missing_fields = _REQUIRED_FIELD_SET - config.keys()
+        missing_or_empty_fields = missing_fields | {
+            field for field in _REQUIRED_FIELD_SET - missing_fields
+            if not config[field]
+        }
+        raise ValueError(
+            "Missing or empty required fields in config file: "
+            + ", ".join(
+                field
+                for field in REQUIRED_FIELDS
+                if field in missing_or_empty_fields
             )
-        except (KeyError, ValueError) as e:
-            raise ValueError(f"Error parsing config file: {e}")
+        )
@@ -1,54 +1,112 @@
+import asyncio
+import logging
 from dataclasses import dataclass, field
+from typing import Self
+from urllib.parse import quote_plus
 import aiohttp
+from yarl import URL
+
+
+_FORM_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+# Pre-encoded form bodies; only the varying fields are quoted per request
+_LOGIN_BODY = "office={}&username={}&password={}"
+_REFILL_BODY = "meds={}&subject=R&reply=&type=R&msg="
+_LIMIT_PER_HOST = 4
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
 class RefillerClient:
     base_url: str
-    client: aiohttp.ClientSession = field(
-        default_factory=aiohttp.ClientSession, init=False
-    )
-
-    async def login(self, username: str, password: str, office: str) -> str:
-        login_url = f"{self.base_url}/login"
-        payload = {
-            "office": office,
-            "username": username,
-            "password": password
-        }
-
-        async with self.client.post(
-            login_url,
-            data=payload,
-            headers={
-                "Content-Type": "application/x-www-form-urlencoded",
-            },
+    client: aiohttp.ClientSession | None = field(default=None, init=False)
+    _login_url: URL = field(init=False, repr=False)
+    _refill_url: URL = field(init=False, repr=False)
+
+    def __post_init__(self):
+        # Parsed once so aiohttp doesn't re-parse the URL on every request
+        self._login_url = URL(f"{self.base_url}/login")
+        self._refill_url = URL(f"{self.base_url}/msgs/newmsg")
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def _session(self) -> aiohttp.ClientSession:
+        # Built lazily so the session is created inside the running loop and
+        # shared by every request, letting login and refill reuse one
+        # keep-alive connection to the portal.
+        if self.client is None:
+            self.client = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=10,
+                    limit_per_host=_LIMIT_PER_HOST,
+                    keepalive_timeout=75,
+                    ttl_dns_cache=300,
+                ),
+                timeout=aiohttp.ClientTimeout(total=30),
+                # The session cookie set by login is carried by the jar;
+                # unsafe=True keeps portals addressed by IP working.
+                cookie_jar=aiohttp.CookieJar(unsafe=True),
+            )
+        return self.client
+
+    async def login(self, username: str, password: str, office: str) -> None:
+        # str() as in aiohttp's own form encoding: TOML may give ints
+        body = _LOGIN_BODY.format(
+            quote_plus(str(office)),
+            quote_plus(str(username)),
+            quote_plus(str(password)),
+        )
+
+        session = await self._session()
+        async with session.post(
+            self._login_url,
+            data=body.encode("ascii"),
+            headers=_FORM_HEADERS,
             allow_redirects=False,
         ) as response:
-            response.raise_for_status()
-            cookie = response.headers.get("Set-Cookie")
-            if not cookie:
+            if response.status >= 400:
+                response.raise_for_status()
+            # Drain the body so the connection goes back to the pool for
+            # the refill request instead of being closed
+            await response.read()
+            if not response.cookies:
                 raise ValueError("Login failed: No session cookie received")
-            return cookie
-
-    async def request_refill(self, cookie: str, med: str) -> bool:
-        refill_url = f"{self.base_url}/msgs/newmsg"
-        payload = {
-            "meds": med,
-            "subject": "R",
-            "reply": "",
-            "type": "R",
-            "msg": ""
-        }
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded",
-            "Cookie": cookie,
-        }
-        async with self.client.post(
-            refill_url, data=payload, headers=headers
+
+    async def request_refill(self, med: str) -> bool:
+        session = await self._session()
+        async with session.post(
+            self._refill_url,
+            data=_REFILL_BODY.format(quote_plus(str(med))).encode("ascii"),
+            headers=_FORM_HEADERS,
         ) as response:
-            response.raise_for_status()
+            if response.status >= 400:
+                response.raise_for_status()
+            await response.read()
             return response.status == 200
 
+    async def request_refills(self, meds: list[str]) -> list[bool]:
+        # Bounded to the per-host connection limit so concurrent refills
+        # reuse pooled connections instead of queueing on the connector.
+        semaphore = asyncio.Semaphore(_LIMIT_PER_HOST)
+
+        # A failed med is reported as False rather than raised, so the
+        # other results survive and callers retry only the failed meds
+        # instead of re-sending refills that already went through.
+        async def refill(med: str) -> bool:
+            async with semaphore:
+                try:
+                    return await self.request_refill(med)
+                except (aiohttp.ClientError, TimeoutError) as e:
+                    logger.error("Refill request for %s failed: %s", med, e)
+                    return False
+
+        return await asyncio.gather(*(refill(med) for med in meds))
+
     async def close(self):
-        await self.client.close()
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
@@ -0,0 +1,21 @@
+"""Shared fixtures for tests"""
+
+import pytest
+
+_CONFIG_CONTENT = """
+    username = "testuser"
+    password = "testpass"
+    base_url = "http://localhost:8000"
+    med_id = "med123"
+    office = "office_A"
+"""
+
+
+@pytest.fixture(scope="session", autouse=True)
+def config_path(tmp_path_factory):
+    """Fixture writing the default config file once and exporting CONFIG_PATH"""
+    path = tmp_path_factory.mktemp("config") / "config.toml"
+    path.write_text(_CONFIG_CONTENT)
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("CONFIG_PATH", str(path))
+        yield path
@@ -3,7 +3,10 @@
 import pytest
 import os
 import tempfile
-from src.config import Config
+import tomllib
+from dataclasses import FrozenInstanceError, fields
+from unittest.mock import patch
+from src.config import REQUIRED_FIELDS, Config, _load_toml
 
 
 @pytest.fixture
@@ -61,13 +64,29 @@ class TestConfigInitialization:
         assert config.password == "p@ssw0rd!#$"
         assert config.med_id == "MED-123-ABC"
 
+    def test_required_fields_match_field_order(self):
+        """Test that REQUIRED_FIELDS lists Config fields in declaration order"""
+        assert REQUIRED_FIELDS == tuple(field.name for field in fields(Config))
+
+    def test_config_is_immutable(self):
+        """Test that Config values cannot be reassigned"""
+        config = Config(
+            username="john_doe",
+            password="secret123",
+            base_url="http://api.example.com",
+            med_id="med123",
+            office="office_B",
+        )
+        with pytest.raises(FrozenInstanceError):
+            config.med_id = "other"  # ty: ignore[invalid-assignment]
+        assert not hasattr(config, "__dict__")
+
 
 class TestConfigFromToml:
     """Test Config.from_toml method"""
 
     def test_from_toml_success(self, temp_config_file):
         """Test successful loading from TOML file"""
-        os.environ["CONFIG_PATH"] = temp_config_file
         config = Config.from_toml(temp_config_file)
 
         assert config.username == "testuser"
@@ -76,10 +95,19 @@ class TestConfigFromToml:
         assert config.med_id == "aspirin"
         assert config.office == "office_A"
 
+    def test_from_toml_bytes_success(self, valid_config_content):
+        """Test successful loading from TOML bytes"""
+        config = Config.from_toml(valid_config_content.encode())
+
+        assert config.username == "testuser"
+        assert config.password == "testpass"
+        assert config.base_url == "http://localhost:8000"
+        assert config.med_id == "aspirin"
+        assert config.office == "office_A"
+
     def test_from_toml_file_not_found(self):
         """Test FileNotFoundError when config file doesn't exist"""
         non_existent_path = "/tmp/non_existent_config_xyz.toml"
-        os.environ["CONFIG_PATH"] = non_existent_path
 
         with pytest.raises(FileNotFoundError, match="Config file not found"):
             Config.from_toml(non_existent_path)
@@ -91,15 +119,8 @@ class TestConfigFromToml:
             password = "testpass"
             base_url = "http://localhost:8000"
         """
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".toml", delete=False) as f:
-            f.write(incomplete_config)
-            temp_path = f.name
-
-        try:
-            with pytest.raises(ValueError, match="Missing or empty required fields"):
-                Config.from_toml(temp_path)
-        finally:
-            os.remove(temp_path)
+        with pytest.raises(ValueError, match="Missing or empty required fields"):
+            Config.from_toml(incomplete_config.encode())
 
     def test_from_toml_empty_required_field(self):
         """Test ValueError when required field is empty"""
@@ -110,20 +131,23 @@ class TestConfigFromToml:
             med_id = "aspirin"
             office = "office_A"
         """
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".toml", delete=False) as f:
-            f.write(empty_field_config)
-            temp_path = f.name
+        with pytest.raises(ValueError, match="Missing or empty required fields"):
+            Config.from_toml(empty_field_config.encode())
 
-        try:
-            with pytest.raises(ValueError, match="Missing or empty required fields"):
-                Config.from_toml(temp_path)
-        finally:
-            os.remove(temp_path)
+    def test_from_toml_missing_and_empty_fields_reported_together(self):
+        """Test that missing and empty fields are reported in one error"""
+        bad_config = """
+            username = ""
+            password = "testpass"
+            base_url = "http://localhost:8000"
+            med_id = "aspirin"
+        """
+        with pytest.raises(ValueError, match="file: username, office$"):
+            Config.from_toml(bad_config.encode())
 
-    def test_from_toml_all_required_fields_present(self, temp_config_file):
+    def test_from_toml_all_required_fields_present(self, valid_config_content):
         """Test that all required fields must be present"""
-        os.environ["CONFIG_PATH"] = temp_config_file
-        config = Config.from_toml(temp_config_file)
+        config = Config.from_toml(valid_config_content.encode())
 
         # Verify all required fields
         required_fields = ["username", "password", "base_url", "med_id", "office"]
@@ -142,20 +166,12 @@ class TestConfigFromToml:
             extra_field = "should be ignored"
             another_extra = "also ignored"
         """
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".toml", delete=False) as f:
-            f.write(config_with_extras)
-            temp_path = f.name
-
-        try:
-            os.environ["CONFIG_PATH"] = temp_path
-            config = Config.from_toml(temp_path)
-            assert config.username == "testuser"
-            # Extra fields should not raise errors
-            assert not hasattr(config, "extra_field")
-        finally:
-            os.remove(temp_path)
-
-    def test_from_toml_with_environment_variable(self, temp_config_file):
+        config = Config.from_toml(config_with_extras.encode())
+        assert config.username == "testuser"
+        # Extra fields should not raise errors
+        assert not hasattr(config, "extra_field")
+
+    def test_from_toml_with_environment_variable(self):
         """Test using CONFIG_PATH environment variable"""
         # The conftest.py fixture sets CONFIG_PATH automatically
         # This test verifies that from_toml() works with the env var set
@@ -163,21 +179,21 @@ class TestConfigFromToml:
 
         assert config.username == "testuser"
 
+    def test_from_toml_without_environment_variable(self, monkeypatch):
+        """Test RuntimeError when no path is given and CONFIG_PATH is unset"""
+        monkeypatch.delenv("CONFIG_PATH")
+
+        with pytest.raises(RuntimeError, match="CONFIG_PATH not set"):
+            Config.from_toml()
+
     def test_from_toml_invalid_toml_syntax(self):
         """Test ValueError with invalid TOML syntax"""
         invalid_toml = """
             username = "testuser
             password = "testpass"
         """
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".toml", delete=False) as f:
-            f.write(invalid_toml)
-            temp_path = f.name
-
-        try:
-            with pytest.raises(Exception):  # tomllib raises various exceptions
-                Config.from_toml(temp_path)
-        finally:
-            os.remove(temp_path)
+        with pytest.raises(Exception):  # tomllib raises various exceptions
+            Config.from_toml(invalid_toml.encode())
 
     def test_from_toml_type_validation(self):
         """Test that config values are properly loaded as strings"""
@@ -188,26 +204,71 @@ class TestConfigFromToml:
             med_id = "123"
             office = "office_A"
         """
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".toml", delete=False) as f:
-            f.write(config_with_types)
-            temp_path = f.name
-
-        try:
-            os.environ["CONFIG_PATH"] = temp_path
-            config = Config.from_toml(temp_path)
-            assert isinstance(config.username, str)
-            assert isinstance(config.med_id, str)
-        finally:
-            os.remove(temp_path)
+        config = Config.from_toml(config_with_types.encode())
+        assert isinstance(config.username, str)
+        assert isinstance(config.med_id, str)
+
+    def test_from_toml_reuses_parsed_file(self, temp_config_file):
+        """Test that an unchanged file is only parsed once"""
+        with patch("src.config.tomllib.loads", wraps=tomllib.loads) as mock_loads:
+            first = Config.from_toml(temp_config_file)
+            second = Config.from_toml(temp_config_file)
+
+        assert first == second
+        mock_loads.assert_called_once()
+
+    def test_from_toml_reloads_modified_file(self, temp_config_file):
+        """Test that a same-size edit with a new mtime is parsed again"""
+        assert Config.from_toml(temp_config_file).med_id == "aspirin"
+
+        with open(temp_config_file) as f:
+            content = f.read()
+        with open(temp_config_file, "w") as f:
+            f.write(content.replace("aspirin", "tylenol"))
+        # Even a 1ns mtime change must invalidate the cached parse
+        stat = os.stat(temp_config_file)
+        os.utime(temp_config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+        assert Config.from_toml(temp_config_file).med_id == "tylenol"
+
+    def test_from_toml_reloads_file_with_preserved_mtime(self, temp_config_file):
+        """Test that an edit keeping the old mtime is parsed again"""
+        assert Config.from_toml(temp_config_file).med_id == "aspirin"
+
+        stat = os.stat(temp_config_file)
+        with open(temp_config_file) as f:
+            content = f.read()
+        with open(temp_config_file, "w") as f:
+            f.write(content.replace("aspirin", "ibuprofen"))
+        # As after a copy or tool that restores timestamps
+        os.utime(temp_config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        assert Config.from_toml(temp_config_file).med_id == "ibuprofen"
+
+    def test_cached_parse_is_read_only(self, temp_config_file):
+        """Test that the shared cached parse cannot be mutated"""
+        stat = os.stat(temp_config_file)
+        parsed = _load_toml(temp_config_file, stat.st_mtime_ns, stat.st_size)
+
+        with pytest.raises(TypeError):
+            parsed["med_id"] = "tylenol"  # ty: ignore[invalid-assignment]
+
+    def test_from_toml_reports_fields_in_order(self):
+        """Test that missing fields are reported in declaration order"""
+        partial_config = """
+            password = "testpass"
+            med_id = "aspirin"
+        """
+        with pytest.raises(ValueError, match="username, base_url, office$"):
+            Config.from_toml(partial_config.encode())
 
 
 class TestConfigIntegration:
     """Integration tests for Config"""
 
-    def test_config_roundtrip(self, temp_config_file):
+    def test_config_roundtrip(self, valid_config_content):
         """Test loading config and using it"""
-        os.environ["CONFIG_PATH"] = temp_config_file
-        config = Config.from_toml(temp_config_file)
+        config = Config.from_toml(valid_config_content.encode())
 
         # Verify config can be used in typical workflow
         assert config.username
@@ -2,8 +2,9 @@
 
 import pytest
 import logging
+import time
 from unittest.mock import AsyncMock, MagicMock, patch
-from main import main
+from main import CachedTimeFormatter, main
 
 
 @pytest.fixture
@@ -18,251 +19,169 @@ def mock_config():
     return config
 
 
+@pytest.fixture(autouse=True)
+def mocked_main(mock_config):
+    """Fixture patching Config and RefillerClient with a successful flow"""
+    with (
+        patch("main.Config") as mock_config_class,
+        patch("main.RefillerClient") as mock_client_class,
+    ):
+        mock_config_class.from_toml.return_value = mock_config
+
+        mock_client = AsyncMock()
+        mock_client.login = AsyncMock(return_value=None)
+        mock_client.request_refill = AsyncMock(return_value=True)
+        mock_client.__aenter__.return_value = mock_client
+        mock_client_class.return_value = mock_client
+
+        yield mock_config_class, mock_client_class, mock_client
+
+
 class TestMainExecution:
     """Test cases for main function execution"""
 
-    async def test_main_successful_flow(self, mock_config):
+    async def test_main_successful_flow(self, mock_config, mocked_main):
         """Test main function with successful login and refill"""
-        with (
-            patch("main.Config") as mock_config_class,
-            patch("main.RefillerClient") as mock_client_class,
-        ):
-            mock_config_class.from_toml.return_value = mock_config
-
-            # Mock client
-            mock_client = AsyncMock()
-            mock_client.login = AsyncMock(return_value="session_id=xyz789")
-            mock_client.request_refill = AsyncMock(return_value=True)
-            mock_client.close = AsyncMock()
-            mock_client_class.return_value = mock_client
+        mock_config_class, mock_client_class, mock_client = mocked_main
 
-            await main()
+        await main()
 
-            # Verify config was loaded
-            mock_config_class.from_toml.assert_called_once()
+        # Verify config was loaded
+        mock_config_class.from_toml.assert_called_once()
 
-            # Verify client was created with correct base_url
-            mock_client_class.assert_called_once_with(mock_config.base_url)
+        # Verify client was created with correct base_url
+        mock_client_class.assert_called_once_with(mock_config.base_url)
 
-            # Verify login was called with correct credentials
-            mock_client.login.assert_called_once_with(
-                mock_config.username, mock_config.password, mock_config.office
-            )
+        # Verify login was called with correct credentials
+        mock_client.login.assert_called_once_with(
+            mock_config.username, mock_config.password, mock_config.office
+        )
 
-            # Verify refill was called with correct medication
-            mock_client.request_refill.assert_called_once_with(
-                "session_id=xyz789", mock_config.med_id
-            )
+        # Verify refill was called with correct medication
+        mock_client.request_refill.assert_called_once_with(mock_config.med_id)
 
-            # Verify client was closed
-            mock_client.close.assert_called_once()
+        # Verify client was closed
+        mock_client.__aexit__.assert_awaited_once()
 
-    async def test_main_failed_login(self, mock_config):
+    async def test_main_failed_login(self, mocked_main):
         """Test main function when login fails"""
-        with (
-            patch("main.Config") as mock_config_class,
-            patch("main.RefillerClient") as mock_client_class,
-        ):
-            mock_config_class.from_toml.return_value = mock_config
-
-            # Mock client with failed login
-            mock_client = AsyncMock()
-            mock_client.login = AsyncMock(side_effect=Exception("Login failed"))
-            mock_client.close = AsyncMock()
-            mock_client_class.return_value = mock_client
-
-            # Main should handle the exception and return
-            await main()
+        _, _, mock_client = mocked_main
+        mock_client.login.side_effect = Exception("Login failed")
+
+        # Main should handle the exception and return
+        await main()
 
-            # Verify login was attempted
-            mock_client.login.assert_called_once()
+        # Verify login was attempted
+        mock_client.login.assert_called_once()
 
-            # Verify refill was NOT called
-            mock_client.request_refill.assert_not_called()
+        # Verify refill was NOT called
+        mock_client.request_refill.assert_not_called()
 
-            # Verify client was still closed
-            mock_client.close.assert_called_once()
+        # Verify client was still closed
+        mock_client.__aexit__.assert_awaited_once()
 
-    async def test_main_failed_refill(self, mock_config):
+    async def test_main_failed_refill(self, mocked_main):
         """Test main function when refill request fails"""
-        with (
-            patch("main.Config") as mock_config_class,
-            patch("main.RefillerClient") as mock_client_class,
-        ):
-            mock_config_class.from_toml.return_value = mock_config
-
-            # Mock client with successful login but failed refill
-            mock_client = AsyncMock()
-            mock_client.login = AsyncMock(return_value="session_id=xyz789")
-            mock_client.request_refill = AsyncMock(
-                side_effect=Exception("Refill failed")
-            )
-            mock_client.close = AsyncMock()
-            mock_client_class.return_value = mock_client
+        _, _, mock_client = mocked_main
+        mock_client.request_refill.side_effect = Exception("Refill failed")
 
-            await main()
+        await main()
 
-            # Verify login was successful
-            mock_client.login.assert_called_once()
+        # Verify login was successful
+        mock_client.login.assert_called_once()
 
-            # Verify refill was attempted
-            mock_client.request_refill.assert_called_once()
+        # Verify refill was attempted
+        mock_client.request_refill.assert_called_once()
 
-            # Verify client was still closed
-            mock_client.close.assert_called_once()
+        # Verify client was still closed
+        mock_client.__aexit__.assert_awaited_once()
 
-    async def test_main_refill_returns_false(self, mock_config):
+    async def test_main_refill_returns_false(self, mocked_main):
         """Test main function when refill request returns False"""
-        with (
-            patch("main.Config") as mock_config_class,
-            patch("main.RefillerClient") as mock_client_class,
-        ):
-            mock_config_class.from_toml.return_value = mock_config
-
-            # Mock client
-            mock_client = AsyncMock()
-            mock_client.login = AsyncMock(return_value="session_id=xyz789")
-            mock_client.request_refill = AsyncMock(return_value=False)
-            mock_client.close = AsyncMock()
-            mock_client_class.return_value = mock_client
+        _, _, mock_client = mocked_main
+        mock_client.request_refill.return_value = False
 
-            await main()
+        await main()
 
-            # Even though refill returned False, execution should complete
-            mock_client.close.assert_called_once()
+        # Even though refill returned False, execution should complete
+        mock_client.__aexit__.assert_awaited_once()
 
-    async def test_main_config_loading_exception(self):
+    async def test_main_config_loading_exception(self, mocked_main):
         """Test main function when config loading fails"""
-        with (
-            patch("main.Config") as mock_config_class,
-            patch("main.RefillerClient") as mock_client_class,
-        ):
-            # Config loading fails
-            mock_config_class.from_toml.side_effect = FileNotFoundError(
-                "Config not found"
-            )
-
-            # Main should handle the exception
-            with pytest.raises(FileNotFoundError):
-                await main()
-
-            # Client should not be created
-            mock_client_class.assert_not_called()
-
-    async def test_main_client_close_called_on_error(self, mock_config):
-        """Test that client.close() is always called even on error"""
-        with (
-            patch("main.Config") as mock_config_class,
-            patch("main.RefillerClient") as mock_client_class,
-        ):
-            mock_config_class.from_toml.return_value = mock_config
-
-            # Mock client
-            mock_client = AsyncMock()
-            mock_client.login = AsyncMock(side_effect=RuntimeError("Network error"))
-            mock_client.close = AsyncMock()
-            mock_client_class.return_value = mock_client
-
+        mock_config_class, mock_client_class, _ = mocked_main
+        # Config loading fails
+        mock_config_class.from_toml.side_effect = FileNotFoundError(
+            "Config not found"
+        )
+
+        # Main should handle the exception
+        with pytest.raises(FileNotFoundError):
             await main()
 
-            # Verify close was called in finally block
-            mock_client.close.assert_called_once()
+        # Client should not be created
+        mock_client_class.assert_not_called()
+
+    async def test_main_client_close_called_on_error(self, mocked_main):
+        """Test that the client context is always exited even on error"""
+        _, _, mock_client = mocked_main
+        mock_client.login.side_effect = RuntimeError("Network error")
+
+        await main()
+
+        # Verify the client context was exited
+        mock_client.__aexit__.assert_awaited_once()
 
 
 class TestMainLogging:
     """Test cases for logging behavior"""
 
-    async def test_main_logs_startup(self, mock_config, caplog):
+    async def test_main_logs_startup(self, caplog):
         """Test that main logs startup message"""
-        with (
-            patch("main.Config") as mock_config_class,
-            patch("main.RefillerClient") as mock_client_class,
-        ):
-            mock_config_class.from_toml.return_value = mock_config
-
-            mock_client = AsyncMock()
-            mock_client.login = AsyncMock(return_value="session_id=xyz789")
-            mock_client.request_refill = AsyncMock(return_value=True)
-            mock_client.close = AsyncMock()
-            mock_client_class.return_value = mock_client
-
-            with caplog.at_level(logging.INFO):
-                await main()
-
-            # Check for startup log message
-            assert any(
-                "Starting refiller service" in record.message
-                for record in caplog.records
-            )
-
-    async def test_main_logs_login_attempt(self, mock_config, caplog):
-        """Test that main logs login attempt"""
-        with (
-            patch("main.Config") as mock_config_class,
-            patch("main.RefillerClient") as mock_client_class,
-        ):
-            mock_config_class.from_toml.return_value = mock_config
+        with caplog.at_level(logging.INFO):
+            await main()
 
-            mock_client = AsyncMock()
-            mock_client.login = AsyncMock(return_value="session_id=xyz789")
-            mock_client.request_refill = AsyncMock(return_value=True)
-            mock_client.close = AsyncMock()
-            mock_client_class.return_value = mock_client
+        # Check for startup log message
+        assert any(
+            "Starting refiller service" in record.message
+            for record in caplog.records
+        )
 
-            with caplog.at_level(logging.INFO):
-                await main()
+    async def test_main_logs_login_attempt(self, caplog):
+        """Test that main logs login attempt"""
+        with caplog.at_level(logging.INFO):
+            await main()
 
-            # Check for login log message
-            assert any("Logging in" in record.message for record in caplog.records)
+        # Check for login log message
+        assert any("Logging in" in record.message for record in caplog.records)
 
-    async def test_main_logs_success(self, mock_config, caplog):
+    async def test_main_logs_success(self, caplog):
         """Test that main logs success message"""
-        with (
-            patch("main.Config") as mock_config_class,
-            patch("main.RefillerClient") as mock_client_class,
-        ):
-            mock_config_class.from_toml.return_value = mock_config
-
-            mock_client = AsyncMock()
-            mock_client.login = AsyncMock(return_value="session_id=xyz789")
-            mock_client.request_refill = AsyncMock(return_value=True)
-            mock_client.close = AsyncMock()
-            mock_client_class.return_value = mock_client
-
-            with caplog.at_level(logging.INFO):
-                await main()
-
-            # Check for success log message
-            assert any(
-                "successful" in record.message.lower() for record in caplog.records
-            )
-
-    async def test_main_logs_error_on_failure(self, mock_config, caplog):
-        """Test that main logs error on failure"""
-        with (
-            patch("main.Config") as mock_config_class,
-            patch("main.RefillerClient") as mock_client_class,
-        ):
-            mock_config_class.from_toml.return_value = mock_config
+        with caplog.at_level(logging.INFO):
+            await main()
 
-            mock_client = AsyncMock()
-            mock_client.login = AsyncMock(side_effect=Exception("Auth failed"))
-            mock_client.close = AsyncMock()
-            mock_client_class.return_value = mock_client
+        # Check for success log message
+        assert any(
+            "successful" in record.message.lower() for record in caplog.records
+        )
 
-            with caplog.at_level(logging.ERROR):
-                await main()
+    async def test_main_logs_error_on_failure(self, mocked_main, caplog):
+        """Test that main logs error on failure"""
+        _, _, mock_client = mocked_main
+        mock_client.login.side_effect = Exception("Auth failed")
+
+        with caplog.at_level(logging.ERROR):
+            await main()
 
-            # Check for error log message
-            assert any(record.levelname == "ERROR" for record in caplog.records)
+        # Check for error log message
+        assert any(record.levelname == "ERROR" for record in caplog.records)
 
 
 class TestMainIntegration:
     """Integration tests for main function"""
 
-    async def test_main_with_different_config_values(self):
-        """Test main with various config values"""
-        configs = [
+    @pytest.mark.parametrize(
+        "config_data",
+        [
             {
                 "username": "user1",
                 "password": "pass1",
@@ -277,67 +196,91 @@ class TestMainIntegration:
                 "med_id": "MED-123",
                 "office": "office_2",
             },
-        ]
-
-        for config_data in configs:
-            with (
-                patch("main.Config") as mock_config_class,
-                patch("main.RefillerClient") as mock_client_class,
-            ):
-                mock_config = MagicMock()
-                for key, value in config_data.items():
-                    setattr(mock_config, key, value)
-                mock_config_class.from_toml.return_value = mock_config
-
-                mock_client = AsyncMock()
-                mock_client.login = AsyncMock(return_value="session_id=xyz789")
-                mock_client.request_refill = AsyncMock(return_value=True)
-                mock_client.close = AsyncMock()
-                mock_client_class.return_value = mock_client
-
-                await main()
-
-                # Verify correct config was used
-                mock_client_class.assert_called_once_with(config_data["base_url"])
-                mock_client.login.assert_called_once_with(
-                    config_data["username"],
-                    config_data["password"],
-                    config_data["office"],
-                )
-
-    async def test_main_cleanup_on_success(self, mock_config):
+        ],
+    )
+    async def test_main_with_different_config_values(
+        self, mock_config, mocked_main, config_data
+    ):
+        """Test main with various config values"""
+        _, mock_client_class, mock_client = mocked_main
+        for key, value in config_data.items():
+            setattr(mock_config, key, value)
+
+        await main()
+
+        # Verify correct config was used
+        mock_client_class.assert_called_once_with(config_data["base_url"])
+        mock_client.login.assert_called_once_with(
+            config_data["username"],
+            config_data["password"],
+            config_data["office"],
+        )
+        mock_client.request_refill.assert_called_once_with(config_data["med_id"])
+
+    async def test_main_cleanup_on_success(self, mocked_main):
         """Test that resources are cleaned up on success"""
-        with (
-            patch("main.Config") as mock_config_class,
-            patch("main.RefillerClient") as mock_client_class,
-        ):
-            mock_config_class.from_toml.return_value = mock_config
-
-            mock_client = AsyncMock()
-            mock_client.login = AsyncMock(return_value="session_id=xyz789")
-            mock_client.request_refill = AsyncMock(return_value=True)
-            mock_client.close = AsyncMock()
-            mock_client_class.return_value = mock_client
+        _, _, mock_client = mocked_main
 
-            await main()
+        await main()
 
-            # Verify cleanup
-            mock_client.close.assert_called_once()
+        # Verify cleanup
+        mock_client.__aexit__.assert_awaited_once()
 
-    async def test_main_cleanup_on_exception(self, mock_config):
+    async def test_main_cleanup_on_exception(self, mocked_main):
         """Test that resources are cleaned up on exception"""
-        with (
-            patch("main.Config") as mock_config_class,
-            patch("main.RefillerClient") as mock_client_class,
-        ):
-            mock_config_class.from_toml.return_value = mock_config
+        _, _, mock_client = mocked_main
+        mock_client.login.side_effect = Exception("Network error")
 
-            mock_client = AsyncMock()
-            mock_client.login = AsyncMock(side_effect=Exception("Network error"))
-            mock_client.close = AsyncMock()
-            mock_client_class.return_value = mock_client
+        await main()
 
-            await main()
+        # Verify cleanup even on exception
+        mock_client.__aexit__.assert_awaited_once()
+
+
+class TestCachedTimeFormatter:
+    """Test cases for the cached asctime formatter"""
+
+    FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+    def make_record(self, created):
+        record = logging.LogRecord("main", logging.INFO, __file__, 1, "msg", None, None)
+        record.created = created
+        record.msecs = (created - int(created)) * 1000
+        return record
+
+    def test_matches_standard_formatter(self):
+        """Test that output is identical to logging.Formatter"""
+        cached = CachedTimeFormatter(self.FORMAT)
+        standard = logging.Formatter(self.FORMAT)
+
+        for created in [1700000000.123, 1700000000.987, 1700000001.5]:
+            record = self.make_record(created)
+            assert cached.format(record) == standard.format(record)
+
+    def test_renders_time_once_per_second(self):
+        """Test that strftime only runs when the second changes"""
+        formatter = CachedTimeFormatter(self.FORMAT)
+
+        with patch("main.time.strftime", wraps=time.strftime) as mock_strftime:
+            for created in [1700000000.1, 1700000000.2, 1700000000.9, 1700000001.0]:
+                formatter.format(self.make_record(created))
+
+        assert mock_strftime.call_count == 2
+
+    def test_explicit_datefmt_bypasses_cache(self):
+        """Test that an explicit datefmt is honoured"""
+        formatter = CachedTimeFormatter("%(asctime)s", datefmt="%Y")
+        record = self.make_record(1700000000.5)
+
+        assert formatter.format(record) == time.strftime(
+            "%Y", time.localtime(1700000000.5)
+        )
+
+    def test_accepts_formatter_arguments(self):
+        """Test that validate and defaults are passed to logging.Formatter"""
+        fmt = "%(asctime)s %(user)s %(message)s"
+        cached = CachedTimeFormatter(fmt, validate=True, defaults={"user": "-"})
+        standard = logging.Formatter(fmt, validate=True, defaults={"user": "-"})
+        record = self.make_record(1700000000.5)
 
-            # Verify cleanup even on exception
-            mock_client.close.assert_called_once()
+        assert cached.format(record) == standard.format(record)
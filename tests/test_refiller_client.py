@@ -1,314 +1,431 @@
 """Tests for refiller_client module"""
 
+import asyncio
 import pytest
+from contextlib import asynccontextmanager
 import aiohttp
-from unittest.mock import AsyncMock, MagicMock
+from aiohttp import test_utils, web
+from unittest.mock import AsyncMock, MagicMock, NonCallableMock
+from urllib.parse import parse_qsl, urlencode
+from yarl import URL
 from src.refiller_client import RefillerClient
+from src.config import Config
+
+_FORM_CONTENT_TYPE = "application/x-www-form-urlencoded"
+_EXPECTED_LOGIN_PAYLOAD = {
+    "office": "office_A",
+    "username": "john_doe",
+    "password": "secret123",
+}
+# Fields sent unchanged with every refill; only "meds" varies
+_REFILL_TAIL = {"subject": "R", "reply": "", "type": "R", "msg": ""}
+
+
+def parse_form(data):
+    """Helper to decode a url-encoded form body into a dict"""
+    return dict(parse_qsl(data.decode(), keep_blank_values=True))
+
+
+class _AsyncCM:
+    """Minimal async context manager yielding a fixed value"""
+
+    __slots__ = ("_value",)
+
+    def __init__(self, value):
+        self._value = value
+
+    async def __aenter__(self):
+        return self._value
+
+    async def __aexit__(self, *exc_info):
+        return None
 
 
 def create_async_cm(return_value):
     """Helper to create an async context manager"""
-    cm = MagicMock()
-    cm.__aenter__ = AsyncMock(return_value=return_value)
-    cm.__aexit__ = AsyncMock(return_value=None)
-    return cm
+    return _AsyncCM(return_value)
 
 
-@pytest.fixture
+class _CapturingSession:
+    """Session stub recording each post as an (args, kwargs) tuple"""
+
+    __slots__ = ("_response", "calls")
+
+    def __init__(self, response):
+        self.calls = []
+        self._response = response
+
+    def post(self, *args, **kwargs):
+        self.calls.append((args, kwargs))
+        return _AsyncCM(self._response)
+
+
+@pytest.fixture(scope="session")
 def base_url():
     """Fixture for base URL"""
     return "http://localhost:8000"
 
 
-@pytest.fixture
+@pytest.fixture(scope="class")
 def mock_session():
-    """Fixture for mocked session"""
+    """Fixture for a mocked session shared by the tests of a class"""
     session = MagicMock()
     session.close = AsyncMock()
     return session
 
 
-class TestRefillerClientLogin:
-    """Test cases for login functionality"""
+@pytest.fixture(autouse=True)
+def _reset_mock_session(mock_session):
+    """Clear calls and configured responses left by the previous test"""
+    mock_session.reset_mock(return_value=True, side_effect=True)
 
-    async def test_login_success(self, base_url):
-        """Test successful login with valid credentials"""
-        # Mock successful response
-        mock_response = MagicMock()
-        mock_response.headers = {"Set-Cookie": "session_id=abc123"}
-        mock_response.raise_for_status = MagicMock()
 
-        # Create async context manager for post response
-        async_cm = create_async_cm(mock_response)
+@pytest.fixture
+def ok_login_response():
+    """Fixture for a login response that sets a session cookie"""
+    response = NonCallableMock(spec=aiohttp.ClientResponse)
+    response.status = 302
+    response.cookies = {"session_id": "abc123"}
+    return response
 
-        # Create mock session with async close
-        mock_session = MagicMock()
-        mock_session.post = MagicMock(return_value=async_cm)
-        mock_session.close = AsyncMock()
 
-        client = RefillerClient(base_url=base_url)
-        client.client = mock_session
+@pytest.fixture
+def ok_refill_response():
+    """Fixture for a successful refill response"""
+    response = NonCallableMock(spec=aiohttp.ClientResponse)
+    response.status = 200
+    return response
+
+
+@pytest.fixture
+def login_cm(ok_login_response):
+    """Fixture for the post context manager yielding the login response"""
+    return _AsyncCM(ok_login_response)
+
+
+@pytest.fixture
+def refill_cm(ok_refill_response):
+    """Fixture for the post context manager yielding the refill response"""
+    return _AsyncCM(ok_refill_response)
+
+
+@pytest.fixture
+def refiller_client(base_url, mock_session):
+    """Fixture for a client using the mocked session"""
+    client = RefillerClient(base_url=base_url)
+    client.client = mock_session
+    return client
+
+
+class TestRefillerClientLogin:
+    """Test cases for login functionality"""
+
+    async def test_login_success(
+        self, refiller_client, mock_session, login_cm, ok_login_response
+    ):
+        """Test successful login with valid credentials"""
+        mock_session.post.return_value = login_cm
 
-        cookie = await client.login("user", "pass", "office1")
+        await refiller_client.login("user", "pass", "office1")
 
-        assert cookie == "session_id=abc123"
         mock_session.post.assert_called_once()
-        await client.close()
+        ok_login_response.raise_for_status.assert_not_called()
+        await refiller_client.close()
         mock_session.close.assert_called_once()
 
-    async def test_login_no_cookie(self, base_url, mock_session):
-        """Test login failure when Set-Cookie header is missing"""
-        # Mock response without Set-Cookie header
-        mock_response = MagicMock()
-        mock_response.headers = {}
-        mock_response.raise_for_status = MagicMock()
+    async def test_login_no_cookie(self, refiller_client, mock_session):
+        """Test login failure when no session cookie is set"""
+        # Mock response without any cookies
+        mock_response = NonCallableMock(spec=aiohttp.ClientResponse)
+        mock_response.status = 302
+        mock_response.cookies = {}
 
         async_cm = create_async_cm(mock_response)
-        mock_session.post = MagicMock(return_value=async_cm)
+        mock_session.post.return_value = async_cm
 
-        client = RefillerClient(base_url=base_url)
-        client.client = mock_session
-
-        with pytest.raises(
-            ValueError, match="Login failed: No session cookie received"
-        ):
-            await client.login("user", "pass", "office1")
+        with pytest.raises(ValueError) as exc_info:
+            await refiller_client.login("user", "pass", "office1")
 
-        await client.close()
+        assert str(exc_info.value) == "Login failed: No session cookie received"
 
-    async def test_login_http_error(self, base_url, mock_session):
+    async def test_login_http_error(self, refiller_client, mock_session):
         """Test login failure when HTTP error occurs"""
         # Mock response that raises HTTP error
-        mock_response = MagicMock()
+        mock_response = NonCallableMock(spec=aiohttp.ClientResponse)
+        mock_response.status = 401
         mock_response.raise_for_status.side_effect = aiohttp.ClientError(
             "401 Unauthorized"
         )
 
         async_cm = create_async_cm(mock_response)
-        mock_session.post = MagicMock(return_value=async_cm)
-
-        client = RefillerClient(base_url=base_url)
-        client.client = mock_session
+        mock_session.post.return_value = async_cm
 
         with pytest.raises(aiohttp.ClientError):
-            await client.login("user", "wrongpass", "office1")
+            await refiller_client.login("user", "wrongpass", "office1")
 
-        await client.close()
-
-    async def test_login_correct_url_and_payload(self, base_url, mock_session):
+    async def test_login_correct_url_and_payload(
+        self, refiller_client, ok_login_response
+    ):
         """Test that login sends correct URL and payload"""
-        mock_response = MagicMock()
-        mock_response.headers = {"Set-Cookie": "session_id=abc123"}
-        mock_response.raise_for_status = MagicMock()
-
-        async_cm = create_async_cm(mock_response)
-        mock_session.post = MagicMock(return_value=async_cm)
-
-        client = RefillerClient(base_url=base_url)
-        client.client = mock_session
+        session = _CapturingSession(ok_login_response)
+        refiller_client.client = session
 
-        await client.login("john_doe", "secret123", "office_A")
+        await refiller_client.login("john_doe", "secret123", "office_A")
 
         # Verify the POST request was made with correct parameters
-        mock_session.post.assert_called_once()
-        call_args = mock_session.post.call_args
-        assert call_args[0][0] == "http://localhost:8000/login"
-        assert call_args[1]["data"] == {
-            "office": "office_A",
-            "username": "john_doe",
-            "password": "secret123",
-        }
-        assert (
-            call_args[1]["headers"]["Content-Type"]
-            == "application/x-www-form-urlencoded"
-        )
-        assert call_args[1]["allow_redirects"] is False
+        ((args, kwargs),) = session.calls
+        assert args == (URL("http://localhost:8000/login"),)
+        assert parse_form(kwargs["data"]) == _EXPECTED_LOGIN_PAYLOAD
+        assert kwargs["headers"]["Content-Type"] == _FORM_CONTENT_TYPE
+        assert kwargs["allow_redirects"] is False
 
-        await client.close()
-
-    async def test_login_with_special_characters(self, base_url):
+    async def test_login_with_special_characters(self, refiller_client):
         """Test login with special characters in credentials"""
-        mock_response = MagicMock()
-        mock_response.headers = {"Set-Cookie": "session_id=xyz789"}
-        mock_response.raise_for_status = MagicMock()
+        mock_response = NonCallableMock(spec=aiohttp.ClientResponse)
+        mock_response.status = 302
+        mock_response.cookies = {"session_id": "xyz789"}
 
-        async_cm = create_async_cm(mock_response)
+        session = _CapturingSession(mock_response)
+        refiller_client.client = session
 
-        mock_session = MagicMock()
-        mock_session.post = MagicMock(return_value=async_cm)
-        mock_session.close = AsyncMock()
-
-        client = RefillerClient(base_url=base_url)
-        client.client = mock_session
         special_pass = "p@ssw0rd!#$%"
-        cookie = await client.login("user@domain.com", special_pass, "office_1")
-
-        assert cookie == "session_id=xyz789"
-        call_args = mock_session.post.call_args
-        assert call_args[1]["data"]["password"] == special_pass
+        await refiller_client.login("user@domain.com", special_pass, "office_1")
 
-        await client.close()
+        ((_, kwargs),) = session.calls
+        assert parse_form(kwargs["data"])["password"] == special_pass
+        # The pre-encoded body matches the standard form encoding
+        assert kwargs["data"] == urlencode(
+            {
+                "office": "office_1",
+                "username": "user@domain.com",
+                "password": special_pass,
+            }
+        ).encode()
 
 
 class TestRefillerClientRequestRefill:
     """Test cases for request_refill functionality"""
 
-    async def test_request_refill_success(self, base_url):
+    async def test_request_refill_success(
+        self, refiller_client, mock_session, refill_cm, ok_refill_response
+    ):
         """Test successful refill request"""
-        # Mock successful response (status 200)
-        mock_response = MagicMock()
-        mock_response.status = 200
-        mock_response.raise_for_status = MagicMock()
-
-        async_cm = create_async_cm(mock_response)
+        mock_session.post.return_value = refill_cm
 
-        mock_session = MagicMock()
-        mock_session.post = MagicMock(return_value=async_cm)
-        mock_session.close = AsyncMock()
-
-        client = RefillerClient(base_url=base_url)
-        client.client = mock_session
-        result = await client.request_refill("session_id=abc123", "aspirin")
+        result = await refiller_client.request_refill("aspirin")
 
         assert result is True
-        await client.close()
+        # Successful statuses skip raise_for_status entirely
+        ok_refill_response.raise_for_status.assert_not_called()
 
-    async def test_request_refill_non_200_status(self, base_url):
+    async def test_request_refill_non_200_status(self, refiller_client, mock_session):
         """Test refill request with non-200 status code"""
         # Mock response with non-200 status
-        mock_response = MagicMock()
+        mock_response = NonCallableMock(spec=aiohttp.ClientResponse)
         mock_response.status = 400
-        mock_response.raise_for_status = MagicMock()
 
         async_cm = create_async_cm(mock_response)
 
-        mock_session = MagicMock()
-        mock_session.post = MagicMock(return_value=async_cm)
-        mock_session.close = AsyncMock()
+        mock_session.post.return_value = async_cm
 
-        client = RefillerClient(base_url=base_url)
-        client.client = mock_session
-        result = await client.request_refill("session_id=abc123", "aspirin")
+        result = await refiller_client.request_refill("aspirin")
 
         assert result is False
-        await client.close()
 
-    async def test_request_refill_various_non_200_statuses(self, base_url):
+    async def test_request_refill_various_non_200_statuses(
+        self, refiller_client, mock_session
+    ):
         """Test refill request with various non-200 status codes"""
-        for status_code in [201, 301, 400, 401, 403, 404, 500, 502, 503]:
-            mock_response = MagicMock()
+        status_codes = [201, 301, 400, 401, 403, 404, 500, 502, 503]
+        mock_responses = []
+        for status_code in status_codes:
+            mock_response = NonCallableMock(spec=aiohttp.ClientResponse)
             mock_response.status = status_code
-            mock_response.raise_for_status = MagicMock()
+            mock_response.raise_for_status.side_effect = aiohttp.ClientError(
+                f"{status_code} error"
+            )
+            mock_responses.append(mock_response)
 
-            async_cm = create_async_cm(mock_response)
+        mock_session.post.side_effect = [
+            create_async_cm(mock_response) for mock_response in mock_responses
+        ]
 
-            mock_session = MagicMock()
-            mock_session.post = MagicMock(return_value=async_cm)
-            mock_session.close = AsyncMock()
+        results = []
+        for _ in status_codes:
+            try:
+                results.append(await refiller_client.request_refill("aspirin"))
+            except aiohttp.ClientError:
+                results.append("raised")
 
-            client = RefillerClient(base_url=base_url)
-            client.client = mock_session
-            result = await client.request_refill("session_id=abc123", "aspirin")
-
-            assert result is False
-            await client.close()
+        # Only error statuses reach raise_for_status; 201/301 return False
+        assert [r.raise_for_status.called for r in mock_responses] == [
+            status_code >= 400 for status_code in status_codes
+        ]
+        assert results == [False, False] + ["raised"] * 7
 
-    async def test_request_refill_http_error(self, base_url):
+    async def test_request_refill_http_error(self, refiller_client, mock_session):
         """Test refill request failure due to HTTP error"""
         # Mock response that raises HTTP error
-        mock_response = MagicMock()
+        mock_response = NonCallableMock(spec=aiohttp.ClientResponse)
+        mock_response.status = 500
         mock_response.raise_for_status.side_effect = aiohttp.ClientError(
             "500 Server Error"
         )
 
         async_cm = create_async_cm(mock_response)
 
-        mock_session = MagicMock()
-        mock_session.post = MagicMock(return_value=async_cm)
-        mock_session.close = AsyncMock()
-
-        client = RefillerClient(base_url=base_url)
-        client.client = mock_session
+        mock_session.post.return_value = async_cm
 
         with pytest.raises(aiohttp.ClientError):
-            await client.request_refill("session_id=abc123", "aspirin")
-
-        await client.close()
+            await refiller_client.request_refill("aspirin")
 
-    async def test_request_refill_correct_url_and_payload(self, base_url):
+    async def test_request_refill_correct_url_and_payload(
+        self, refiller_client, ok_refill_response
+    ):
         """Test that refill request sends correct URL and payload"""
-        mock_response = MagicMock()
-        mock_response.status = 200
-        mock_response.raise_for_status = MagicMock()
+        session = _CapturingSession(ok_refill_response)
+        refiller_client.client = session
 
-        async_cm = create_async_cm(mock_response)
+        await refiller_client.request_refill("ibuprofen")
 
-        mock_session = MagicMock()
-        mock_session.post = MagicMock(return_value=async_cm)
-        mock_session.close = AsyncMock()
+        # Verify the POST request was made with correct parameters
+        ((args, kwargs),) = session.calls
+        assert args == (URL("http://localhost:8000/msgs/newmsg"),)
+        assert parse_form(kwargs["data"]) == {**_REFILL_TAIL, "meds": "ibuprofen"}
+        assert kwargs["data"] == b"meds=ibuprofen&subject=R&reply=&type=R&msg="
+        assert kwargs["headers"]["Content-Type"] == _FORM_CONTENT_TYPE
+        assert "Cookie" not in kwargs["headers"]
+
+    async def test_request_refill_different_medications(
+        self, refiller_client, ok_refill_response
+    ):
+        """Test refill request with different medication names"""
+        medications = ["aspirin", "ibuprofen", "amoxicillin", "med-123"]
+        session = _CapturingSession(ok_refill_response)
+        refiller_client.client = session
 
-        client = RefillerClient(base_url=base_url)
-        client.client = mock_session
-        await client.request_refill("session_id=abc123", "ibuprofen")
+        results = [await refiller_client.request_refill(med) for med in medications]
 
-        # Verify the POST request was made with correct parameters
-        mock_session.post.assert_called_once()
-        call_args = mock_session.post.call_args
-        assert call_args[0][0] == "http://localhost:8000/msgs/newmsg"
-        assert call_args[1]["data"] == {
-            "meds": "ibuprofen",
-            "subject": "R",
-            "reply": "",
-            "type": "R",
-            "msg": "",
-        }
-        assert (
-            call_args[1]["headers"]["Content-Type"]
-            == "application/x-www-form-urlencoded"
+        assert results == [True] * len(medications)
+        payloads = [parse_form(kwargs["data"]) for _, kwargs in session.calls]
+        assert payloads == [{**_REFILL_TAIL, "meds": med} for med in medications]
+
+
+class TestRefillerClientRequestRefills:
+    """Test cases for request_refills functionality"""
+
+    async def test_request_refills_preserves_order(self, refiller_client, mock_session):
+        """Test that results are returned in the same order as meds"""
+        responses = []
+        for status_code in [200, 400, 200]:
+            mock_response = NonCallableMock(spec=aiohttp.ClientResponse)
+            mock_response.status = status_code
+            responses.append(create_async_cm(mock_response))
+
+        mock_session.post.side_effect = responses
+
+        results = await refiller_client.request_refills(
+            ["aspirin", "ibuprofen", "tylenol"]
         )
-        assert call_args[1]["headers"]["Cookie"] == "session_id=abc123"
 
-        await client.close()
+        assert results == [True, False, True]
+        sent_meds = [
+            parse_form(call[1]["data"])["meds"]
+            for call in mock_session.post.call_args_list
+        ]
+        assert sent_meds == ["aspirin", "ibuprofen", "tylenol"]
+
+    async def test_request_refills_failure_keeps_sibling_results(
+        self, refiller_client, mock_session, ok_refill_response, caplog
+    ):
+        """Test that a failed med is reported as False without hiding the others"""
+        failed_response = NonCallableMock(spec=aiohttp.ClientResponse)
+        failed_response.status = 500
+        failed_response.raise_for_status.side_effect = aiohttp.ClientError(
+            "500 Server Error"
+        )
 
-    async def test_request_refill_different_medications(self, base_url):
-        """Test refill request with different medication names"""
-        medications = ["aspirin", "ibuprofen", "amoxicillin", "med-123"]
+        mock_session.post.side_effect = [
+            create_async_cm(failed_response),
+            *(create_async_cm(ok_refill_response) for _ in range(3)),
+        ]
 
-        for med in medications:
-            mock_response = MagicMock()
-            mock_response.status = 200
-            mock_response.raise_for_status = MagicMock()
+        results = await refiller_client.request_refills(["bad", "a", "b", "c"])
 
-            async_cm = create_async_cm(mock_response)
+        assert results == [False, True, True, True]
+        assert not all(results)
+        assert mock_session.post.call_count == 4
+        assert "Refill request for bad failed: 500 Server Error" in caplog.text
 
-            mock_session = MagicMock()
-            mock_session.post = MagicMock(return_value=async_cm)
-            mock_session.close = AsyncMock()
+    async def test_request_refills_bounds_concurrency(
+        self, refiller_client, mock_session, ok_refill_response
+    ):
+        """Test that concurrent refills are limited to the per-host limit"""
+        in_flight = 0
+        peak = 0
 
-            client = RefillerClient(base_url=base_url)
-            client.client = mock_session
-            result = await client.request_refill("session_id=abc123", med)
+        @asynccontextmanager
+        async def post(*args, **kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            try:
+                await asyncio.sleep(0)
+                yield ok_refill_response
+            finally:
+                in_flight -= 1
 
-            assert result is True
-            call_args = mock_session.post.call_args
-            assert call_args[1]["data"]["meds"] == med
+        mock_session.post.side_effect = post
+
+        results = await refiller_client.request_refills([f"med-{i}" for i in range(10)])
+
+        assert results == [True] * 10
+        assert peak == 4
 
-            await client.close()
+    async def test_request_refills_empty(self, refiller_client, mock_session):
+        """Test that no requests are made for an empty medication list"""
+        assert await refiller_client.request_refills([]) == []
+        mock_session.post.assert_not_called()
 
 
 class TestRefillerClientClose:
     """Test cases for close functionality"""
 
-    async def test_close_session(self, base_url):
+    async def test_close_session(self, base_url, mock_session):
         """Test that close method properly closes the session"""
-        mock_session = MagicMock()
-        mock_session.close = AsyncMock()
-
         client = RefillerClient(base_url=base_url)
         client.client = mock_session
         await client.close()
 
         mock_session.close.assert_called_once()
+        assert client.client is None
+
+    async def test_close_without_session(self, base_url):
+        """Test that close is a no-op when no session was created"""
+        client = RefillerClient(base_url=base_url)
+        await client.close()
+
+        assert client.client is None
+
+    async def test_context_manager_closes_session(self, base_url, mock_session):
+        """Test that exiting the async context closes the session"""
+        async with RefillerClient(base_url=base_url) as client:
+            client.client = mock_session
+
+        mock_session.close.assert_called_once()
+        assert client.client is None
+
+    async def test_context_manager_closes_session_on_error(
+        self, base_url, mock_session
+    ):
+        """Test that the session is closed and the error propagates"""
+        with pytest.raises(RuntimeError, match="boom"):
+            async with RefillerClient(base_url=base_url) as client:
+                client.client = mock_session
+                raise RuntimeError("boom")
+
+        mock_session.close.assert_called_once()
+        assert client.client is None
 
 
 class TestRefillerClientInitialization:
@@ -318,91 +435,149 @@ class TestRefillerClientInitialization:
         """Test client initialization with base_url"""
         client = RefillerClient(base_url=base_url)
         assert client.base_url == base_url
-        assert client.client is not None
-        await client.close()
+        assert client.client is None
 
-    async def test_initialization_with_different_base_urls(self):
-        """Test client initialization with different base URLs"""
-        urls = [
+    @pytest.mark.parametrize(
+        "url",
+        [
             "http://api.example.com",
             "https://secure.example.com:8443",
             "http://localhost:3000",
             "https://192.168.1.1:9000",
-        ]
+        ],
+    )
+    async def test_initialization_with_different_base_urls(self, url):
+        """Test client initialization with different base URLs"""
+        client = RefillerClient(base_url=url)
 
-        for url in urls:
-            client = RefillerClient(base_url=url)
-            assert client.base_url == url
-            await client.close()
+        assert client.base_url == url
+        # Construction alone never opens a session
+        assert client.client is None
 
     async def test_client_session_factory(self):
-        """Test that ClientSession is created via factory"""
+        """Test that ClientSession is created lazily and reused"""
+        client = RefillerClient(base_url="http://localhost:8000")
+
+        # ClientSession should only be created once it is needed
+        session = await client._session()
+        assert isinstance(session, aiohttp.ClientSession)
+        assert client.client is session
+        assert await client._session() is session
+        await client.close()
+
+    async def test_client_session_connector_settings(self):
+        """Test that the shared session keeps connections alive per host"""
         client = RefillerClient(base_url="http://localhost:8000")
 
-        # ClientSession should be created when client is instantiated
-        assert client.client is not None
-        assert isinstance(client.client, aiohttp.ClientSession)
+        session = await client._session()
+        connector = session.connector
+        assert isinstance(connector, aiohttp.TCPConnector)
+        assert connector.limit == 10
+        assert connector.limit_per_host == 4
+        assert session.timeout.total == 30
         await client.close()
 
 
+@pytest.mark.xdist_group("integration")
 class TestRefillerClientIntegration:
     """Integration tests combining multiple operations"""
 
-    async def test_full_workflow(self, base_url):
+    async def test_full_workflow(
+        self,
+        refiller_client,
+        mock_session,
+        login_cm,
+        refill_cm,
+        ok_login_response,
+        ok_refill_response,
+    ):
         """Test complete workflow: login -> request refill -> close"""
-        # Mock login response
-        login_response = MagicMock()
-        login_response.headers = {"Set-Cookie": "session_id=xyz789"}
-        login_response.raise_for_status = MagicMock()
-
-        # Mock refill response
-        refill_response = MagicMock()
-        refill_response.status = 200
-        refill_response.raise_for_status = MagicMock()
-
-        login_cm = create_async_cm(login_response)
-        refill_cm = create_async_cm(refill_response)
-
-        mock_session = MagicMock()
         # Set up mock to return different responses for different calls
         mock_session.post.side_effect = [login_cm, refill_cm]
-        mock_session.close = AsyncMock()
-
-        client = RefillerClient(base_url=base_url)
-        client.client = mock_session
 
         # Login
-        cookie = await client.login("user", "pass", "office1")
-        assert cookie == "session_id=xyz789"
+        await refiller_client.login("user", "pass", "office1")
 
-        # Request refill
-        result = await client.request_refill(cookie, "medicine")
+        # Request refill, relying on the session cookie jar
+        result = await refiller_client.request_refill("medicine")
         assert result is True
 
+        # Both bodies are drained so the pooled connection can be reused
+        ok_login_response.read.assert_awaited_once()
+        ok_refill_response.read.assert_awaited_once()
+
         # Close
-        await client.close()
+        await refiller_client.close()
         mock_session.close.assert_called_once()
 
-    async def test_multiple_refill_requests(self, base_url):
+    async def test_numeric_config_values(self):
+        """Test that integer TOML values are sent as their string form"""
+        forms = []
+
+        async def login(request):
+            forms.append(dict(await request.post()))
+            response = web.Response(status=302, headers={"Location": "/"})
+            response.set_cookie("session_id", "abc123")
+            return response
+
+        async def refill(request):
+            forms.append(dict(await request.post()))
+            return web.Response()
+
+        app = web.Application()
+        app.router.add_post("/login", login)
+        app.router.add_post("/msgs/newmsg", refill)
+
+        config = Config.from_toml(b"""
+            username = "user"
+            password = "pass"
+            base_url = "http://localhost:8000"
+            med_id = 12345
+            office = 3
+        """)
+        async with test_utils.TestServer(app, host="127.0.0.1") as server:
+            base_url = str(server.make_url("")).rstrip("/")
+            async with RefillerClient(base_url=base_url) as client:
+                await client.login(config.username, config.password, config.office)
+                assert await client.request_refill(config.med_id) is True
+
+        assert forms[0]["office"] == "3"
+        assert forms[1]["meds"] == "12345"
+
+    async def test_login_cookie_sent_with_refill(self):
+        """Test that the login cookie reaches the refill on an IP-addressed portal"""
+        refill_cookies = []
+
+        async def login(request):
+            response = web.Response(status=302, headers={"Location": "/"})
+            response.set_cookie("session_id", "abc123")
+            return response
+
+        async def refill(request):
+            refill_cookies.append(request.cookies.get("session_id"))
+            return web.Response()
+
+        app = web.Application()
+        app.router.add_post("/login", login)
+        app.router.add_post("/msgs/newmsg", refill)
+
+        # A real server and session, so the cookie jar is actually exercised
+        async with test_utils.TestServer(app, host="127.0.0.1") as server:
+            base_url = str(server.make_url("")).rstrip("/")
+            async with RefillerClient(base_url=base_url) as client:
+                await client.login("user", "pass", "office1")
+                assert await client.request_refill("aspirin") is True
+
+        assert refill_cookies == ["abc123"]
+
+    async def test_multiple_refill_requests(
+        self, refiller_client, mock_session, refill_cm
+    ):
         """Test making multiple refill requests with same session"""
-        mock_response = MagicMock()
-        mock_response.status = 200
-        mock_response.raise_for_status = MagicMock()
-
-        async_cm = create_async_cm(mock_response)
-
-        mock_session = MagicMock()
-        mock_session.post = MagicMock(return_value=async_cm)
-        mock_session.close = AsyncMock()
-
-        client = RefillerClient(base_url=base_url)
-        client.client = mock_session
-        cookie = "session_id=xyz789"
+        mock_session.post.return_value = refill_cm
 
         # Make multiple refill requests
         medications = ["aspirin", "ibuprofen", "tylenol"]
         for med in medications:
-            result = await client.request_refill(cookie, med)
+            result = await refiller_client.request_refill(med)
             assert result is True
-
-        await client.close()